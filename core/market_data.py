@@ -4,15 +4,71 @@ Tradovate WebSocket Market Data Client
 Handles: real-time quotes, DOM, position updates
 """
 
-import json
+import os
+import time
 import asyncio
+import inspect
+import logging
+import msgspec
 import websockets
-from typing import Callable, Dict, Optional
+# The asyncio implementation explicitly: recv(decode=...) and cancel-safe
+# recv() don't exist in the legacy client (websockets.connect before 14.0)
+from websockets.asyncio.client import connect as ws_connect
+from typing import Callable, Dict, Optional, Union
 from dataclasses import dataclass
 from datetime import datetime
 
+from utils._json import dumps
 
-@dataclass
+log = logging.getLogger(__name__)
+
+
+# Offset from time.monotonic_ns() to wall-clock epoch ns, fixed at import
+_WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+def _mono_to_datetime(ns: int) -> datetime:
+    """Convert a time.monotonic_ns() stamp to local wall-clock time"""
+    return datetime.fromtimestamp((ns + _WALL_OFFSET_NS) / 1e9)
+
+
+# Wire schema: frames decode straight into these, no intermediate dicts.
+# Unknown fields are ignored; gc=False since they never form cycles.
+# Numeric fields accept null (Tradovate sends it for empty book sides);
+# _handle_message coalesces them.
+
+class QuoteMsg(msgspec.Struct, gc=False):
+    contractId: Union[int, str, None] = None
+    bidPrice: Optional[float] = None
+    askPrice: Optional[float] = None
+    price: Optional[float] = None
+    bidSize: Optional[int] = None
+    askSize: Optional[int] = None
+    volume: Optional[int] = None
+
+
+class PositionMsg(msgspec.Struct, gc=False):
+    accountId: Union[int, str, None] = None
+    contractId: Union[int, str, None] = None
+    netPos: Optional[int] = None
+    netPrice: Optional[float] = None
+    unrealized: Optional[float] = None
+
+
+class WSPayload(msgspec.Struct, gc=False):
+    quotes: list[QuoteMsg] = []
+    positions: list[PositionMsg] = []
+
+
+class WSMessage(msgspec.Struct, gc=False):
+    # Only object payloads carry market data; responses may send other shapes
+    d: Union[WSPayload, list, str, float, bool, None] = None
+
+
+_DECODER = msgspec.json.Decoder(WSMessage, strict=False)
+
+
+@dataclass(slots=True)
 class Quote:
     symbol: str
     bid: float
@@ -21,16 +77,32 @@ class Quote:
     bid_size: int
     ask_size: int
     volume: int
-    timestamp: datetime
+    timestamp: int  # time.monotonic_ns()
+    open: float  # First/high/low of `last` across coalesced ticks (== last for one tick)
+    high: float
+    low: float
+    
+    @property
+    def as_datetime(self) -> datetime:
+        return _mono_to_datetime(self.timestamp)
+    
+    @property
+    def wall_ns(self) -> int:
+        """timestamp as wall-clock epoch ns"""
+        return self.timestamp + _WALL_OFFSET_NS
 
 
-@dataclass  
+@dataclass(slots=True)
 class Position:
     symbol: str
     qty: int
     avg_entry: float
     unrealized_pnl: float
-    timestamp: datetime
+    timestamp: int  # time.monotonic_ns()
+    
+    @property
+    def as_datetime(self) -> datetime:
+        return _mono_to_datetime(self.timestamp)
 
 
 class MarketDataClient:
@@ -44,6 +116,13 @@ class MarketDataClient:
     - md/subscribeQuote: Real-time quotes
     - md/subscribeDOM: Order book
     - user/syncRequest: Position updates
+    
+    Frames are drained in batches. on_quote handlers get one coalesced
+    Quote per symbol per batch (latest values, open/high/low over the
+    batch); on_quote_batch handlers get every raw Quote. With coalesce_ns
+    set, a coalesced Quote never spans a multiple of it on the wall clock
+    (e.g. a bar boundary): the batch is split there instead. Handlers may
+    be plain functions or coroutine functions.
     """
     
     def __init__(self, auth_manager):
@@ -51,9 +130,22 @@ class MarketDataClient:
         self.ws = None
         self.connected = False
         
-        # Handlers
-        self.quote_handlers: list[Callable] = []
-        self.position_handlers: list[Callable] = []
+        # Handlers: immutable tuples, split by kind once at registration
+        # (async ones awaited concurrently, sync ones called inline)
+        self._quote_handlers: tuple = ()
+        self._quote_handlers_sync: tuple = ()
+        self._quote_batch_handlers: tuple = ()
+        self._quote_batch_handlers_sync: tuple = ()
+        self._position_handlers: tuple = ()
+        self._position_handlers_sync: tuple = ()
+        
+        # Batch drain
+        self.max_batch = 256  # frames per batch
+        self.coalesce_ns = 0  # split coalesced quotes at multiples of this (0 = off)
+        
+        # permessage-deflate costs more CPU than it saves on small JSON frames;
+        # WS_COMPRESSION=deflate re-enables it for slow links
+        self.compression = "deflate" if os.getenv("WS_COMPRESSION", "none") == "deflate" else None
         
         # State
         self.quotes: Dict[str, Quote] = {}
@@ -65,20 +157,28 @@ class MarketDataClient:
     async def connect(self) -> bool:
         """Connect to WebSocket with auth"""
         if not self.auth.md_access_token:
-            print("No MD access token. Authenticate first.")
+            log.error("No MD access token. Authenticate first.")
             return False
         
         try:
-            self.ws = await websockets.connect(self.auth.ws_url)
+            # TCP_NODELAY is already set by the event loop on TCP transports
+            self.ws = await ws_connect(
+                self.auth.ws_url,
+                compression=self.compression,
+                max_size=2**20,
+                max_queue=64,
+                ping_interval=20,
+                ping_timeout=20
+            )
             
             # Authenticate WS
             auth_msg = {
                 "token": self.auth.md_access_token
             }
-            await self.ws.send(json.dumps(auth_msg))
+            await self.ws.send(dumps(auth_msg).decode())
             
             response = await self.ws.recv()
-            print(f"WS Connected: {response}")
+            log.info("WS Connected: %s", response)
             
             self.connected = True
             
@@ -88,7 +188,7 @@ class MarketDataClient:
             return True
             
         except Exception as e:
-            print(f"WS connect error: {e}")
+            log.error("WS connect error: %s", e)
             return False
     
     async def subscribe_quote(self, symbol: str):
@@ -98,7 +198,7 @@ class MarketDataClient:
         MNQ symbols: MNQH6 (March), MNQM6 (June), etc.
         """
         if not self.ws:
-            print("Not connected")
+            log.warning("Not connected")
             return
         
         msg = {
@@ -108,8 +208,8 @@ class MarketDataClient:
             }
         }
         
-        await self.ws.send(json.dumps(msg))
-        print(f"Subscribed to quotes: {symbol}")
+        await self.ws.send(dumps(msg).decode())
+        log.info("Subscribed to quotes: %s", symbol)
     
     async def subscribe_position(self):
         """
@@ -118,7 +218,7 @@ class MarketDataClient:
         url: user/syncRequest
         """
         if not self.ws:
-            print("Not connected")
+            log.warning("Not connected")
             return
         
         msg = {
@@ -128,67 +228,178 @@ class MarketDataClient:
             }
         }
         
-        await self.ws.send(json.dumps(msg))
-        print("Subscribed to position updates")
+        await self.ws.send(dumps(msg).decode())
+        log.info("Subscribed to position updates")
     
     async def _listener(self):
         """Background listener for WS messages"""
         while self.connected and self.ws:
             try:
-                msg = await self.ws.recv()
-                data = json.loads(msg)
-                await self._handle_message(data)
+                batch = await self._recv_batch()
+                await self._handle_message(batch)
             except websockets.exceptions.ConnectionClosed:
-                print("WS connection closed")
+                log.warning("WS connection closed")
                 self.connected = False
                 break
             except Exception as e:
-                print(f"WS error: {e}")
+                log.error("WS error: %s", e)
     
-    async def _handle_message(self, data: dict):
-        """Route messages to handlers"""
+    async def _recv_batch(self) -> list[WSMessage]:
+        """Wait for one frame, then drain any frames already buffered"""
+        # decode=False: take text frames as raw bytes, msgspec validates
+        # UTF-8 while parsing so websockets' own decode pass is skipped
+        batch: list[WSMessage] = []
+        self._decode_into(batch, await self.ws.recv(decode=False))
         
-        # Quote data
-        if "quotes" in data.get("d", {}):
-            for quote_data in data["d"]["quotes"]:
-                quote = Quote(
-                    symbol=quote_data.get("contractId"),
-                    bid=quote_data.get("bidPrice", 0),
-                    ask=quote_data.get("askPrice", 0),
-                    last=quote_data.get("price", 0),
-                    bid_size=quote_data.get("bidSize", 0),
-                    ask_size=quote_data.get("askSize", 0),
-                    volume=quote_data.get("volume", 0),
-                    timestamp=datetime.now()
-                )
-                self.quotes[quote.symbol] = quote
-                
-                for handler in self.quote_handlers:
-                    await handler(quote)
-        
-        # Position data
-        if "positions" in data.get("d", {}):
-            for pos_data in data["d"]["positions"]:
-                if pos_data.get("accountId") == self.auth.account_id:
+        while len(batch) < self.max_batch:
+            msg = await self._recv_buffered()
+            if msg is None:
+                break
+            self._decode_into(batch, msg)
+        
+        return batch
+    
+    async def _recv_buffered(self) -> Optional[bytes]:
+        """Next frame if one is already buffered, else None (never waits on the network)"""
+        task = asyncio.ensure_future(self.ws.recv(decode=False))
+        # One loop step: recv() finishes within it iff a whole frame is queued
+        await asyncio.sleep(0)
+        
+        if not task.done():
+            # recv() is cancellation-safe, the frame stays queued for the next call;
+            # wait for the cancel to land so that call doesn't overlap this one
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return None
+        
+        if isinstance(task.exception(), websockets.ConnectionClosed):
+            # Closed mid-drain: handle what we have, next recv() re-raises
+            return None
+        return task.result()
+    
+    @staticmethod
+    def _decode_into(batch: list, raw):
+        """Decode one frame into the batch, dropping frames that don't fit the schema"""
+        try:
+            batch.append(_DECODER.decode(raw))
+        except msgspec.DecodeError as e:  # also covers ValidationError
+            log.warning("WS frame skipped: %s", e)
+    
+    async def _handle_message(self, batch: list[WSMessage]):
+        """Route a batch of messages to handlers"""
+        quotes: list[Quote] = []
+        
+        # Locals for the per-tick loop
+        append = quotes.append
+        now = time.monotonic_ns
+        account_id = self.auth.account_id
+        
+        for msg in batch:
+            d = msg.d
+            if type(d) is not WSPayload:
+                continue
+            
+            # Quote data
+            for q in d.quotes:
+                last = q.price
+                if last is None:
+                    # No trade price in this update: carry the last one forward
+                    last = self._last_price(q.contractId, quotes)
+                    if last is None:
+                        continue
+                # Positional: symbol, bid, ask, last, bid_size, ask_size, volume, timestamp, open, high, low
+                append(Quote(
+                    q.contractId, q.bidPrice or 0.0, q.askPrice or 0.0, last,
+                    q.bidSize or 0, q.askSize or 0, q.volume or 0, now(), last, last, last
+                ))
+            
+            # Position data
+            if d.positions:
+                for p in d.positions:
+                    if p.accountId != account_id:
+                        continue
                     position = Position(
-                        symbol=pos_data.get("contractId"),
-                        qty=pos_data.get("netPos", 0),
-                        avg_entry=pos_data.get("netPrice", 0),
-                        unrealized_pnl=pos_data.get("unrealized", 0),
-                        timestamp=datetime.now()
+                        p.contractId, p.netPos or 0, p.netPrice or 0.0, p.unrealized or 0.0, now()
                     )
                     self.positions[position.symbol] = position
                     
-                    for handler in self.position_handlers:
-                        await handler(position)
+                    await self._dispatch(
+                        self._position_handlers, self._position_handlers_sync, position
+                    )
+        
+        if not quotes:
+            return
+        
+        await self._dispatch(
+            self._quote_batch_handlers, self._quote_batch_handlers_sync, quotes
+        )
+        
+        # Coalesce per symbol (and per coalesce_ns window): latest values,
+        # open/high/low over the batch. Dict order keeps windows chronological.
+        merged: Dict[tuple, Quote] = {}
+        window_ns = self.coalesce_ns
+        for quote in quotes:
+            key = (quote.symbol, quote.wall_ns // window_ns if window_ns else 0)
+            prev = merged.get(key)
+            if prev is not None:
+                high = prev.high if prev.high > quote.high else quote.high
+                low = prev.low if prev.low < quote.low else quote.low
+                quote = Quote(
+                    quote.symbol, quote.bid, quote.ask, quote.last,
+                    quote.bid_size, quote.ask_size, quote.volume,
+                    quote.timestamp, prev.open, high, low
+                )
+            merged[key] = quote
+        
+        latest = self.quotes
+        dispatch = self._dispatch
+        handlers = self._quote_handlers
+        handlers_sync = self._quote_handlers_sync
+        for quote in merged.values():
+            latest[quote.symbol] = quote
+            
+            await dispatch(handlers, handlers_sync, quote)
+    
+    def _last_price(self, symbol, pending: list) -> Optional[float]:
+        """Latest trade price for symbol: this batch first, then the quote cache"""
+        for quote in reversed(pending):
+            if quote.symbol == symbol:
+                return quote.last
+        prev = self.quotes.get(symbol)
+        return prev.last if prev is not None else None
+    
+    @staticmethod
+    async def _dispatch(handlers: tuple, handlers_sync: tuple, arg):
+        """Call sync handlers inline, run async handlers concurrently"""
+        for handler in handlers_sync:
+            handler(arg)
+        
+        if len(handlers) == 1:
+            # Common case: skip gather's task wrapping
+            await handlers[0](arg)
+        elif handlers:
+            await asyncio.gather(*(handler(arg) for handler in handlers))
     
     def on_quote(self, handler: Callable):
-        """Register quote handler"""
-        self.quote_handlers.append(handler)
+        """Register quote handler (one coalesced Quote per symbol per batch)"""
+        if inspect.iscoroutinefunction(handler):
+            self._quote_handlers += (handler,)
+        else:
+            self._quote_handlers_sync += (handler,)
+    
+    def on_quote_batch(self, handler: Callable):
+        """Register batch handler (list of every raw Quote in the batch)"""
+        if inspect.iscoroutinefunction(handler):
+            self._quote_batch_handlers += (handler,)
+        else:
+            self._quote_batch_handlers_sync += (handler,)
     
     def on_position(self, handler: Callable):
         """Register position handler"""
-        self.position_handlers.append(handler)
+        if inspect.iscoroutinefunction(handler):
+            self._position_handlers += (handler,)
+        else:
+            self._position_handlers_sync += (handler,)
     
     def get_last_quote(self, symbol: str) -> Optional[Quote]:
         """Get last quote for symbol"""
@@ -237,4 +448,5 @@ async def test_ws():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     asyncio.run(test_ws())
@@ -6,10 +6,16 @@ Handles: placing, modifying, cancelling, tracking orders
 
 import aiohttp
 import asyncio
+import logging
+from collections import deque
 from typing import Dict, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
 
+from utils._json import dumps
+
+log = logging.getLogger(__name__)
+
 
 class OrderAction(Enum):
     BUY = "Buy"
@@ -30,7 +36,20 @@ class TimeInForce(Enum):
     FOK = "FOK"  # Fill or Kill
 
 
-@dataclass
+# Wire string -> enum, O(1) lookup when tracking placed orders
+_ACTION_MAP = {e.value: e for e in OrderAction}
+_ORDER_TYPE_MAP = {e.value: e for e in OrderType}
+_TIF_MAP = {e.value: e for e in TimeInForce}
+
+_PRICED_TYPES = frozenset(("Limit", "StopLimit"))
+_STOP_TYPES = frozenset(("Stop", "StopLimit"))
+
+# Orders in these states are dropped from local tracking
+# (Tradovate reports "Canceled"; cancel_order records "Cancelled")
+_TERMINAL_STATUSES = frozenset(("Filled", "Cancelled", "Canceled", "Rejected", "Expired"))
+
+
+@dataclass(slots=True)
 class Order:
     order_id: Optional[int]
     symbol: str
@@ -60,8 +79,32 @@ class OrderManager:
     def __init__(self, auth_manager):
         self.auth = auth_manager
         self.base_url = auth_manager.base_url
-        self.pending_orders: Dict[int, Order] = {}
-        self.executions: list = []
+        self.pending_orders: Dict[int, Order] = {}  # live orders only
+        self.executions: deque = deque(maxlen=1024)  # most recent fills
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Shared keep-alive session for all order requests.
+        
+        Reusing one connector avoids a TCP+TLS handshake per order.
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=10,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60
+                ),
+                json_serialize=lambda obj: dumps(obj).decode()
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
         
     async def place_order(
         self,
@@ -93,43 +136,44 @@ class OrderManager:
         }
         
         # Add price for limit/stop orders
-        if price and order_type in ["Limit", "StopLimit"]:
+        if price and order_type in _PRICED_TYPES:
             body["price"] = price
             
-        if stop_price and order_type in ["Stop", "StopLimit"]:
+        if stop_price and order_type in _STOP_TYPES:
             body["stopPrice"] = stop_price
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=body) as resp:
-                    data = await resp.json()
+            session = await self._get_session()
+            async with session.post(url, headers=headers, json=body) as resp:
+                data = await resp.json()
                     
-                    if resp.status == 200:
-                        order_id = data.get("orderId")
-                        print(f"✅ Order placed: {action} {qty}x {symbol} @ {order_type} | ID: {order_id}")
+                if resp.status == 200:
+                    order_id = data.get("orderId")
+                    log.info("✅ Order placed: %s %sx %s @ %s | ID: %s", action, qty, symbol, order_type, order_id)
                         
-                        # Track locally
-                        order = Order(
-                            order_id=order_id,
-                            symbol=symbol,
-                            action=OrderAction(action),
-                            qty=qty,
-                            order_type=OrderType(order_type),
-                            price=price,
-                            stop_price=stop_price,
-                            time_in_force=TimeInForce(time_in_force),
-                            status="Working"
-                        )
-                        if order_id:
-                            self.pending_orders[order_id] = order
+                    # Track locally
+                    order = Order(
+                        order_id=order_id,
+                        symbol=symbol,
+                        action=_ACTION_MAP[action],
+                        qty=qty,
+                        order_type=_ORDER_TYPE_MAP[order_type],
+                        price=price,
+                        stop_price=stop_price,
+                        time_in_force=_TIF_MAP[time_in_force],
+                        status="Working"
+                    )
+                    # Market orders fill on acceptance: only resting orders are live
+                    if order_id and order_type != "Market":
+                        self.pending_orders[order_id] = order
                         
-                        return data
-                    else:
-                        print(f"❌ Order failed: {data}")
-                        return None
+                    return data
+                else:
+                    log.error("❌ Order failed: %s", data)
+                    return None
                         
         except Exception as e:
-            print(f"Order error: {e}")
+            log.error("Order error: %s", e)
             return None
     
     async def cancel_order(self, order_id: int) -> bool:
@@ -144,18 +188,17 @@ class OrderManager:
         body = {"orderId": order_id}
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=body) as resp:
-                    if resp.status == 200:
-                        print(f"✅ Cancelled order: {order_id}")
-                        if order_id in self.pending_orders:
-                            self.pending_orders[order_id].status = "Cancelled"
-                        return True
-                    else:
-                        print(f"⚠️ Cancel failed: {resp.status}")
-                        return False
+            session = await self._get_session()
+            async with session.post(url, headers=headers, json=body) as resp:
+                if resp.status == 200:
+                    log.info("✅ Cancelled order: %s", order_id)
+                    self.update_status(order_id, "Cancelled")
+                    return True
+                else:
+                    log.warning("⚠️ Cancel failed: %s", resp.status)
+                    return False
         except Exception as e:
-            print(f"Cancel error: {e}")
+            log.error("Cancel error: %s", e)
             return False
     
     async def modify_order(
@@ -179,36 +222,61 @@ class OrderManager:
             body["orderQty"] = new_qty
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=body) as resp:
-                    if resp.status == 200:
-                        print(f"✅ Modified order: {order_id}")
-                        return True
-                    else:
-                        print(f"⚠️ Modify failed: {resp.status}")
-                        return False
+            session = await self._get_session()
+            async with session.post(url, headers=headers, json=body) as resp:
+                if resp.status == 200:
+                    log.info("✅ Modified order: %s", order_id)
+                    order = self.pending_orders.get(order_id)
+                    if order:
+                        if new_price:
+                            order.price = new_price
+                        if new_qty:
+                            order.qty = new_qty
+                    return True
+                else:
+                    log.warning("⚠️ Modify failed: %s", resp.status)
+                    return False
         except Exception as e:
-            print(f"Modify error: {e}")
+            log.error("Modify error: %s", e)
             return False
     
+    def update_status(self, order_id: int, status: str):
+        """
+        Record an order status change.
+        
+        Terminal orders (Filled/Cancelled/Rejected/Expired) are evicted so
+        pending_orders only ever holds live orders. Fed by cancel_order and
+        by the server's order list in get_orders.
+        """
+        if status in _TERMINAL_STATUSES:
+            self.pending_orders.pop(order_id, None)
+        elif order_id in self.pending_orders:
+            self.pending_orders[order_id].status = status
+    
     async def get_orders(self, status: str = "Working") -> list:
         """
-        Get list of orders.
+        Get list of orders in the given status.
         
         GET /order/list or /order/deps
+        
+        Also syncs local tracking: orders the server reports as filled,
+        cancelled, etc. are evicted from pending_orders.
         """
         url = f"{self.base_url}/order/list"
         headers = self.auth.get_auth_headers()
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return data
-                    return []
+            session = await self._get_session()
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    for o in data:
+                        if o.get("ordStatus"):
+                            self.update_status(o.get("orderId"), o["ordStatus"])
+                    return [o for o in data if o.get("ordStatus") == status]
+                return []
         except Exception as e:
-            print(f"Get orders error: {e}")
+            log.error("Get orders error: %s", e)
             return []
     
     async def flatten_all(self) -> bool:
@@ -216,10 +284,16 @@ class OrderManager:
         Cancel all working orders (emergency kill switch).
         """
         orders = await self.get_orders("Working")
-        for order in orders:
-            await self.cancel_order(order.get("orderId"))
-        print(f"Flattened {len(orders)} orders")
-        return True
+        ids = [o.get("orderId") for o in orders if o.get("orderId")]
+        
+        # Cancel concurrently: N orders in ~1 RTT instead of N
+        results = await asyncio.gather(
+            *(self.cancel_order(order_id) for order_id in ids),
+            return_exceptions=True
+        )
+        cancelled = sum(1 for r in results if r is True)
+        log.info("Flattened %s/%s orders", cancelled, len(ids))
+        return cancelled == len(ids)
 
 
 # Example usage
@@ -243,4 +317,5 @@ async def test_orders():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     asyncio.run(test_orders())
@@ -4,26 +4,29 @@ Tradovate Risk Manager
 Handles: daily loss limits, position sizing, kill switch
 """
 
-from dataclasses import dataclass
+import time
+import logging
+from dataclasses import dataclass, field
 from typing import Optional
 from datetime import datetime, timedelta
 
+log = logging.getLogger(__name__)
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class RiskConfig:
-    """Risk parameters for trading"""
+    """Risk parameters for trading (immutable, so derived values are computed once)"""
     max_daily_loss: float = -500      # USD, stop trading if hit
     max_position_size: int = 2        # Max contracts
     max_trades_per_day: int = 10      # Max trades
     position_size_pct: float = 0.02    # 2% of account per trade
     account_balance: float = 10000    # Default for sizing
     r_per_trade: float = 100         # 1R = $100 (MNQ ~2 ticks)
+    position_size: int = field(init=False)  # Contracts, derived once below
     
-    @property
-    def position_size(self) -> int:
-        """Calculate position size in contracts"""
+    def __post_init__(self):
         size = int((self.account_balance * self.position_size_pct) / self.r_per_trade)
-        return min(size, self.max_position_size)
+        object.__setattr__(self, "position_size", min(size, self.max_position_size))
 
 
 class RiskManager:
@@ -40,11 +43,22 @@ class RiskManager:
     def __init__(self, config: RiskConfig = None):
         self.config = config or RiskConfig()
         
+        # Config-time constants for check_entry
+        self._dollars_per_point = 0.50  # MNQ
+        self._min_risk_points = self.config.r_per_trade / self._dollars_per_point
+        
         # Session state
         self.daily_pnl: float = 0.0
         self.trades_today: int = 0
         self.daily_start: datetime = datetime.now()
+        self._next_day_at: float = self._next_midnight()
         self.kill_switch_triggered: bool = False
+    
+    @staticmethod
+    def _next_midnight() -> float:
+        """Epoch seconds of the next local midnight"""
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, datetime.min.time()).timestamp()
         
     def check_entry(self, direction: str, size: int, entry_price: float, stop_price: float) -> tuple[bool, str]:
         """
@@ -69,23 +83,20 @@ class RiskManager:
         if size > self.config.max_position_size:
             return False, f"MAX_SIZE exceeded ({size} > {self.config.max_position_size})"
         
-        # Check risk:reward (minimum 1:1)
+        # Check risk:reward (minimum 1:1), in points: r_per_trade / $ per point
         risk = abs(entry_price - stop_price)
-        # For MNQ, risk in points
-        reward_per_contract = risk * 0.50  # $0.50 per point
-        
-        if reward_per_contract < self.config.r_per_trade:
-            return False, f"Poor R:R ({risk} pts = ${reward_per_contract})"
+        if risk < self._min_risk_points:
+            return False, f"Poor R:R ({risk} pts = ${risk * self._dollars_per_point})"
         
         return True, "OK"
     
     def update_pnl(self, realized_pnl: float):
         """Update daily P&L after trade closes"""
         self.daily_pnl += realized_pnl
-        print(f"Daily P&L: ${self.daily_pnl:.2f} | Trades: {self.trades_today}")
+        log.info("Daily P&L: $%.2f | Trades: %s", self.daily_pnl, self.trades_today)
         
         if self.daily_pnl <= self.config.max_daily_loss:
-            print(f"🚨 DAILY LOSS LIMIT HIT: ${self.daily_pnl}")
+            log.critical("🚨 DAILY LOSS LIMIT HIT: $%s", self.daily_pnl)
             self.kill_switch_triggered = True
     
     def record_trade(self):
@@ -94,12 +105,14 @@ class RiskManager:
     
     def reset_day(self):
         """Reset for new trading day"""
-        if datetime.now().date() > self.daily_start.date():
+        # Float compare against a cached boundary, no datetime per check
+        if time.time() >= self._next_day_at:
             self.daily_pnl = 0.0
             self.trades_today = 0
             self.daily_start = datetime.now()
+            self._next_day_at = self._next_midnight()
             self.kill_switch_triggered = False
-            print("📅 New day reset")
+            log.info("📅 New day reset")
     
     def get_position_size(self) -> int:
         """Get recommended position size"""
@@ -146,6 +159,8 @@ class RiskManager:
 
 # Example
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     config = RiskConfig(
         max_daily_loss=-300,
         account_balance=5000,
@@ -11,16 +11,31 @@ Strategy:
 - NO trailing stop
 """
 
+import os
+import sys
+import queue
 import asyncio
+import logging
+import logging.handlers
 import signal
 from datetime import datetime
-from typing import Optional
+from typing import Mapping, Optional
+
+import numpy as np
+
+try:
+    import uvloop  # libuv event loop, not available on Windows
+except ImportError:
+    uvloop = None
 
 from utils.auth_manager import TradovateAuth
 from core.order_manager import OrderManager
-from core.market_data import MarketDataClient, Quote
+from core.market_data import MarketDataClient, Quote, Position
 from core.risk_manager import RiskManager, RiskConfig
 from strategies.momentum_30pt import Momentum30pt, Candle
+from utils._json import dumps
+
+log = logging.getLogger(__name__)
 
 
 class MNQTradingBot:
@@ -30,7 +45,7 @@ class MNQTradingBot:
     Flow:
     1. Authenticate with Tradovate
     2. Connect to market data (WebSocket)
-    3. Build 5-min candles from ticks
+    3. Build 5-min candles from ticks (bar closes on the first tick past the boundary)
     4. Detect 30pt momentum on CLOSE
     5. Execute: Stop at candle LOW, Target at 1R
     6. Set and forget - no trailing
@@ -49,30 +64,57 @@ class MNQTradingBot:
         
         # State
         self.running = False
-        self.current_candle: Optional[Candle] = None
-        self.last_signal: Optional[dict] = None
+        self._stop_requested = asyncio.Event()  # set by request_stop (Ctrl+C)
+        self.position: Optional[Position] = None
+        self.last_signal: Optional[Mapping] = None  # strategy-owned, overwritten per signal
+        
+        # In-progress bar as plain floats; a Candle is only built at close
+        self.bar_seconds = 300  # 5 minutes
+        self._bar_ns = self.bar_seconds * 10**9
+        self._bucket: Optional[int] = None  # wall-clock bar index
+        self._open = self._high = self._low = self._close = 0.0
+        self._volume = 0
+        
+        # Closed bars: the quote handler only enqueues, _bar_worker runs the
+        # strategy and order calls so the WebSocket listener never waits on HTTP
+        self._bar_queue: asyncio.Queue = asyncio.Queue()
+        self._bar_worker_task: Optional[asyncio.Task] = None
+        
+        # Closed-bar history as SoA ring buffers, for vectorized indicators
+        self.history_size = 512
+        self._hist_open = np.empty(self.history_size, dtype=np.float64)
+        self._hist_high = np.empty(self.history_size, dtype=np.float64)
+        self._hist_low = np.empty(self.history_size, dtype=np.float64)
+        self._hist_close = np.empty(self.history_size, dtype=np.float64)
+        self._hist_count = 0  # bars written in total
         
         # Stats
         self.trades_today = 0
         self.daily_pnl = 0.0
         
-        print(f"🐺 Wolf MNQ Bot initialized")
-        print(f"   Mode: {'PAPER' if paper_mode else 'LIVE'}")
-        print(f"   Symbol: {symbol}")
-        print(f"   Strategy: 30pt momentum (5min CLOSES)")
-        print(f"   Stop: Candle LOW | Target: 1R | NO trail")
+        # Paper trade log: hot path enqueues, a background task writes
+        self.trade_log_path = "paper_trades.log"
+        self._log_queue: asyncio.Queue = asyncio.Queue(maxsize=1024)
+        self._log_writer_task: Optional[asyncio.Task] = None
+        self._renew_task: Optional[asyncio.Task] = None
+        
+        log.info("🐺 Wolf MNQ Bot initialized")
+        log.info("   Mode: %s", "PAPER" if paper_mode else "LIVE")
+        log.info("   Symbol: %s", symbol)
+        log.info("   Strategy: 30pt momentum (5min CLOSES)")
+        log.info("   Stop: Candle LOW | Target: 1R | NO trail")
         
     async def start(self):
         """Start the bot"""
-        print("\n" + "="*60)
-        print("STARTING BOT")
-        print("="*60)
+        log.info("\n%s", "=" * 60)
+        log.info("STARTING BOT")
+        log.info("=" * 60)
         
         # 1. Authenticate
         self.auth = TradovateAuth()
         success = await self.auth.authenticate()
         if not success:
-            print("❌ Authentication failed")
+            log.error("❌ Authentication failed")
             return
         
         # 2. Initialize components
@@ -90,65 +132,145 @@ class MNQTradingBot:
         if ws_connected:
             await self.market_data.subscribe_quote(self.symbol)
             await self.market_data.subscribe_position()
+            self.market_data.coalesce_ns = self._bar_ns  # never merge ticks across a bar boundary
             self.market_data.on_quote(self._on_quote)
+            self.market_data.on_position(self._on_position)
             
         # 4. Start main loop
         self.running = True
-        asyncio.create_task(self.auth.auto_renew())
-        asyncio.create_task(self._candle_builder())
+        self._renew_task = asyncio.create_task(self.auth.auto_renew())
+        self._bar_worker_task = asyncio.create_task(self._bar_worker())
+        self._log_writer_task = asyncio.create_task(self._log_writer())
+        
+        log.info("\n✅ Bot running. Press Ctrl+C to stop.")
+        
+        # Run until Ctrl+C or until auth is lost for good; shutdown happens here, once
+        stop_wait = asyncio.create_task(self._stop_requested.wait())
+        await asyncio.wait((stop_wait, self._renew_task), return_when=asyncio.FIRST_COMPLETED)
+        stop_wait.cancel()
         
-        print("\n✅ Bot running. Press Ctrl+C to stop.")
+        if not self._stop_requested.is_set():
+            # Auth was rejected for good (or renewal crashed): stop before the token lapses
+            if not self._renew_task.cancelled() and self._renew_task.exception():
+                log.error("❌ Token renewal error: %s", self._renew_task.exception())
+            log.error("❌ Token renewal stopped, shutting down")
         
-        while self.running:
-            await asyncio.sleep(1)
+        await self.stop()
+    
+    def request_stop(self):
+        """Ask a running start() to shut down (safe to call more than once)"""
+        self._stop_requested.set()
     
     def _on_quote(self, quote: Quote):
-        """Handle real-time quote, build candle"""
-        if not self.current_candle:
-            self.current_candle = Candle(
-                open=quote.last,
-                high=quote.last,
-                low=quote.last,
-                close=quote.last,
-                volume=quote.volume,
-                timestamp=datetime.now()
-            )
+        """Handle real-time quote (coalesced per batch), roll 5-min bars"""
+        bucket = quote.wall_ns // self._bar_ns
+        
+        if bucket != self._bucket:
+            if self._bucket is not None:
+                self._bar_queue.put_nowait(self._snapshot_bar())
+            self._bucket = bucket
+            self._open = quote.open
+            self._high = quote.high
+            self._low = quote.low
         else:
-            self.current_candle.high = max(self.current_candle.high, quote.last)
-            self.current_candle.low = min(self.current_candle.low, quote.last)
-            self.current_candle.close = quote.last
-            self.current_candle.volume = quote.volume
+            if quote.high > self._high:
+                self._high = quote.high
+            if quote.low < self._low:
+                self._low = quote.low
+        
+        self._close = quote.last
+        self._volume = quote.volume
     
-    async def _candle_builder(self):
-        """Build 5-minute candles and check for signals"""
-        while self.running:
-            await asyncio.sleep(300)  # 5 minutes
-            
-            if not self.current_candle:
-                continue
-            
-            candle = self.current_candle
-            self.current_candle = None
-            
-            print(f"\n[5min CLOSE] O:{candle.open:.2f} H:{candle.high:.2f} L:{candle.low:.2f} C:{candle.close:.2f}")
-            
-            signal = self.strategy.on_candle_close(candle)
-            
-            if signal:
-                self.last_signal = signal
-                print(self.strategy.print_signal(signal))
-                await self._execute_signal(signal)
+    async def _on_position(self, position: Position):
+        """Track our symbol's position for the double-position guardrail"""
+        if position.symbol == self.symbol:
+            self.position = position
+    
+    def _snapshot_bar(self) -> Candle:
+        """Freeze the in-progress bar into a Candle"""
+        return Candle(
+            open=self._open,
+            high=self._high,
+            low=self._low,
+            close=self._close,
+            volume=self._volume,
+            timestamp=datetime.fromtimestamp(self._bucket * self.bar_seconds)
+        )
+    
+    async def _bar_worker(self):
+        """Background task: run closed bars through the strategy, in order"""
+        # One bar at a time, orders included: the strategy's reused signal
+        # mapping is never overwritten while an order for it is in flight
+        while True:
+            candle = await self._bar_queue.get()
+            try:
+                await self._close_bar(candle)
+            except Exception as e:
+                log.error("Bar processing error: %s", e)
+    
+    async def _close_bar(self, candle: Candle):
+        """Record a closed bar and check for signals"""
+        log.info("\n[5min CLOSE] O:%.2f H:%.2f L:%.2f C:%.2f", candle.open, candle.high, candle.low, candle.close)
+        
+        self._push_bar(candle)
+        if self.orders and self.orders.pending_orders:
+            # Evict bracket legs that filled or were cancelled since the last bar
+            await self.orders.get_orders()
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("   ATR(14): %s", self.atr(14))
+        
+        signal = self.strategy.on_candle_close(candle)
+        
+        if signal:
+            self.last_signal = signal
+            self.strategy.log_signal(signal)
+            await self._execute_signal(signal)
+    
+    def _push_bar(self, candle: Candle):
+        """Write a closed bar into the history ring"""
+        i = self._hist_count % self.history_size
+        self._hist_open[i] = candle.open
+        self._hist_high[i] = candle.high
+        self._hist_low[i] = candle.low
+        self._hist_close[i] = candle.close
+        self._hist_count += 1
     
-    async def _execute_signal(self, signal: dict):
+    def recent_bars(self, n: Optional[int] = None) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Last n closed bars as (opens, highs, lows, closes), oldest first.
+        
+        Returns copies; at most history_size bars are kept.
+        """
+        available = min(self._hist_count, self.history_size)
+        n = available if n is None else min(n, available)
+        idx = np.arange(self._hist_count - n, self._hist_count) % self.history_size
+        return (
+            self._hist_open[idx],
+            self._hist_high[idx],
+            self._hist_low[idx],
+            self._hist_close[idx]
+        )
+    
+    def atr(self, period: int = 14) -> Optional[float]:
+        """Average true range over the last `period` closed bars"""
+        _, highs, lows, closes = self.recent_bars(period + 1)
+        if len(closes) < period + 1:
+            return None
+        
+        high, low, prev_close = highs[1:], lows[1:], closes[:-1]
+        true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+        return float(true_range.mean())
+    
+    async def _execute_signal(self, signal: Mapping):
         """Execute trade signal"""
         direction = signal["direction"]
         entry = signal["entry_price"]
         stop = signal["stop_price"]
-        target = self.strategy.calculate_target(entry, stop, direction)
+        target = signal["target_price"]
         
         # GUARDRAIL: No double positions
         if self.position and self.position.qty != 0:
-            print(f"\n🔒 GUARDRAIL: Position already open ({self.position.qty}x). Skip.")
+            log.warning("\n🔒 GUARDRAIL: Position already open (%sx). Skip.", self.position.qty)
             return
         
         # Risk check
@@ -156,22 +278,22 @@ class MNQTradingBot:
         allowed, reason = self.risk.check_entry(direction, 1, entry, stop)
         
         if not allowed:
-            print(f"❌ Risk block: {reason}")
+            log.warning("❌ Risk block: %s", reason)
             return
         
-        print(f"\n🎯 EXECUTING:")
-        print(f"   {direction} 1x {self.symbol}")
-        print(f"   Entry: {entry:.2f}")
-        print(f"   Stop: {stop:.2f} (low of breakout candle)")
-        print(f"   Target: {target:.2f} (1R = ${abs(entry-stop)*0.50:.2f})")
-        print(f"   Set and forget - no trailing stop")
+        log.info("\n🎯 EXECUTING:")
+        log.info("   %s 1x %s", direction, self.symbol)
+        log.info("   Entry: %.2f", entry)
+        log.info("   Stop: %.2f (low of breakout candle)", stop)
+        log.info("   Target: %.2f (1R = $%.2f)", target, abs(entry - stop) * 0.50)
+        log.info("   Set and forget - no trailing stop")
         
         if self.paper_mode:
             await self._paper_trade(signal, target)
         else:
             await self._live_trade(signal, target)
     
-    async def _paper_trade(self, signal: dict, target: float):
+    async def _paper_trade(self, signal: Mapping, target: float):
         """Log paper trade"""
         trade = {
             "time": datetime.now().isoformat(),
@@ -184,14 +306,65 @@ class MNQTradingBot:
             "mode": "PAPER"
         }
         
-        with open("paper_trades.log", "a") as f:
-            f.write(f"{trade}\n")
+        try:
+            self._log_queue.put_nowait(dumps(trade).decode())
+        except asyncio.QueueFull:
+            log.warning("   ⚠️ Trade log queue full, entry dropped: %s", trade)
+        else:
+            log.info("   🔵 PAPER TRADE LOGGED")
         
-        print(f"   🔵 PAPER TRADE LOGGED")
         self.risk.record_trade()
         self.trades_today += 1
     
-    async def _live_trade(self, signal: dict, target: float):
+    async def _log_writer(self):
+        """
+        Background task: append queued trade lines to disk off the event loop.
+        
+        A None on the queue stops it, after everything queued before the
+        None has been written.
+        """
+        while True:
+            line = await self._log_queue.get()
+            lines = []
+            while line is not None:
+                lines.append(line)
+                if self._log_queue.empty():
+                    break
+                line = self._log_queue.get_nowait()
+            
+            if lines:
+                try:
+                    await asyncio.to_thread(self._append_trade_lines, lines)
+                except OSError as e:
+                    # Keep draining so the queue never fills up behind a dead writer
+                    log.error("❌ Trade log write failed, %s entries lost: %s", len(lines), e)
+            
+            if line is None:
+                return
+    
+    def _append_trade_lines(self, lines: list[str]):
+        """Blocking write of JSON lines, runs in a worker thread"""
+        with open(self.trade_log_path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+    
+    async def _flush_trade_log(self):
+        """Stop the writer and write anything still queued"""
+        if self._log_writer_task and not self._log_writer_task.done():
+            # Cancelling wouldn't stop a write already running in its thread, so
+            # let the writer finish its batch and exit, then append after it
+            await self._log_queue.put(None)
+            await self._log_writer_task
+        
+        lines = []
+        while not self._log_queue.empty():
+            lines.append(self._log_queue.get_nowait())
+        if lines:
+            try:
+                await asyncio.to_thread(self._append_trade_lines, lines)
+            except OSError as e:
+                log.error("❌ Trade log write failed, %s entries lost: %s", len(lines), e)
+    
+    async def _live_trade(self, signal: Mapping, target: float):
         """Execute live trade"""
         direction = signal["direction"]
         
@@ -204,63 +377,143 @@ class MNQTradingBot:
         )
         
         if result:
-            print(f"   🔴 LIVE ENTRY FILLED")
+            log.info("   🔴 LIVE ENTRY FILLED")
             
-            # Stop order
-            await self.orders.place_order(
-                symbol=self.symbol,
-                action="Sell" if direction == "Buy" else "Buy",
-                qty=1,
-                order_type="Stop",
-                stop_price=signal["stop_price"]
-            )
-            print(f"   🛑 Stop placed at {signal['stop_price']}")
+            exit_action = "Sell" if direction == "Buy" else "Buy"
             
-            # Target order (1R)
-            await self.orders.place_order(
-                symbol=self.symbol,
-                action="Sell" if direction == "Buy" else "Buy",
-                qty=1,
-                order_type="Limit",
-                price=target
+            # Bracket only needs the entry accepted, so send stop + target together
+            stop_result, target_result = await asyncio.gather(
+                # Stop order
+                self.orders.place_order(
+                    symbol=self.symbol,
+                    action=exit_action,
+                    qty=1,
+                    order_type="Stop",
+                    stop_price=signal["stop_price"]
+                ),
+                # Target order (1R)
+                self.orders.place_order(
+                    symbol=self.symbol,
+                    action=exit_action,
+                    qty=1,
+                    order_type="Limit",
+                    price=target
+                ),
+                return_exceptions=True
             )
-            print(f"   🎯 Target placed at {target} (1R)")
+            # place_order returns None on failure; gather may also hand back an exception
+            stop_ok = stop_result is not None and not isinstance(stop_result, BaseException)
+            target_ok = target_result is not None and not isinstance(target_result, BaseException)
+            
+            if target_ok:
+                log.info("   🎯 Target placed at %s (1R)", target)
+            else:
+                log.error("   ❌ Target leg failed: %s", target_result)
+            
+            if stop_ok:
+                log.info("   🛑 Stop placed at %s", signal["stop_price"])
+            else:
+                # Never leave the entry open without its stop
+                log.error("   ❌ Stop leg failed (%s), flattening entry", stop_result)
+                await self._unwind_entry(exit_action, target_result if target_ok else None)
             
             self.risk.record_trade()
             self.trades_today += 1
     
+    async def _unwind_entry(self, exit_action: str, target_result: Optional[dict]):
+        """Close an unprotected entry at market and pull its target leg"""
+        calls = [
+            self.orders.place_order(
+                symbol=self.symbol,
+                action=exit_action,
+                qty=1,
+                order_type="Market"
+            )
+        ]
+        if target_result and target_result.get("orderId"):
+            calls.append(self.orders.cancel_order(target_result["orderId"]))
+        
+        flatten_result = (await asyncio.gather(*calls, return_exceptions=True))[0]
+        if flatten_result is None or isinstance(flatten_result, BaseException):
+            log.error("   ❌ Flatten failed (%s): position is open with NO STOP", flatten_result)
+        else:
+            log.warning("   ⚠️ Entry flattened after stop failure")
+    
     async def stop(self):
         """Stop bot gracefully"""
-        print("\n🛑 Stopping bot...")
+        log.info("\n🛑 Stopping bot...")
         self.running = False
         
+        # No new signals/orders while flattening
+        if self._bar_worker_task:
+            self._bar_worker_task.cancel()
+        
         if self.orders:
-            print("   Flattening positions...")
+            log.info("   Flattening positions...")
             await self.orders.flatten_all()
+            await self.orders.close()
         
         if self.market_data:
             await self.market_data.disconnect()
         
-        print("Bot stopped.")
-        print(f"Trades today: {self.trades_today}")
-        print(f"Daily P&L: ${self.daily_pnl:.2f}")
+        await self._flush_trade_log()
+        
+        # A renewal in flight would reopen the HTTP session after close()
+        if self._renew_task:
+            self._renew_task.cancel()
+            await asyncio.gather(self._renew_task, return_exceptions=True)
+        
+        if self.auth:
+            await self.auth.close()
+        
+        log.info("Bot stopped.")
+        log.info("Trades today: %s", self.trades_today)
+        log.info("Daily P&L: $%.2f", self.daily_pnl)
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue to a stdout writer thread.
+    
+    The blocking stdout write happens on the listener thread. Message
+    formatting does not: QueueHandler.prepare() formats the record in the
+    caller's thread, so keep log calls lazy (%-args, isEnabledFor guards
+    for expensive ones). Level from LOG_LEVEL (INFO).
+    """
+    log_queue = queue.SimpleQueue()
+    
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    
+    root = logging.getLogger()
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener.start()
+    return listener
 
 
 async def main():
-    import os
     paper = os.getenv("TRADOVATE_MODE", "demo") == "demo"
     bot = MNQTradingBot(paper_mode=paper)
     
-    def shutdown(sig, frame):
-        asyncio.create_task(bot.stop())
-    
-    signal.signal(signal.SIGINT, shutdown)
-    
+    # Ctrl+C only requests the stop; start() runs the shutdown itself, once
+    loop = asyncio.get_running_loop()
     try:
-        await bot.start()
-    except KeyboardInterrupt:
-        await bot.stop()
+        loop.add_signal_handler(signal.SIGINT, bot.request_stop)
+    except NotImplementedError:
+        # Windows loops: plain handler, hop back onto the loop
+        signal.signal(signal.SIGINT, lambda sig, frame: loop.call_soon_threadsafe(bot.request_stop))
+    
+    await bot.start()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    listener = setup_logging()
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    try:
+        asyncio.run(main())
+    finally:
+        listener.stop()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+AOT build for the Momentum30pt scan loop
+Compiles _scan_30pt_loop ahead of time with numba.pycc into
+strategies/momentum_aot*.so, so a restart never waits on the JIT.
+
+Build (from repo root):
+    python -m strategies._compile
+"""
+
+import os
+
+from numba.pycc import CC
+
+from strategies.momentum_30pt import _scan_30pt_loop
+
+
+cc = CC("momentum_aot")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Export the plain-Python body; the JIT dispatcher itself can't be exported.
+# One symbol per dtype: float32 for CandleArray, float64 for everything else
+_scan = getattr(_scan_30pt_loop, "py_func", _scan_30pt_loop)
+cc.export("scan_30pt", "Tuple((i8[:], i1[:], f8[:]))(f8[:], f8[:], f8[:], f8)")(_scan)
+cc.export("scan_30pt_f4", "Tuple((i8[:], i1[:], f4[:]))(f4[:], f4[:], f4[:], f4)")(_scan)
+
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"Built momentum_aot in {cc.output_dir}")
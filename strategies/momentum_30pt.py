@@ -8,28 +8,141 @@ Target: 1R exactly (data shows TP1 = best)
 NO trailing stop
 """
 
-from typing import Optional, Dict
-from dataclasses import dataclass
+import logging
+from types import MappingProxyType
+from typing import Optional, Dict, Mapping
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
 
+import numpy as np
 
-@dataclass
+from utils._njit import njit, prange, NUMBA_AVAILABLE
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
 class Candle:
-    """5-minute candle data"""
+    """5-minute candle data (immutable once the bar closes)"""
     open: float
     high: float
     low: float
     close: float
     volume: int
     timestamp: datetime
+    # Direction flags as plain slots (no property dispatch); a doji is neither
+    is_bullish: bool = field(init=False)
+    is_bearish: bool = field(init=False)
     
-    @property
-    def is_bullish(self) -> bool:
-        return self.close > self.open
+    def __post_init__(self):
+        object.__setattr__(self, "is_bullish", self.close > self.open)
+        object.__setattr__(self, "is_bearish", self.close < self.open)
+
+
+@dataclass
+class CandleArray:
+    """
+    Candle history as Struct-of-Arrays, for vectorized backtests.
+    
+    Prices are float32: MNQ's 0.25pt ticks are exact in float32 up to
+    ~4M, and half-width rows halve the memory traffic of the scans.
+    Timestamps are datetime64[ns] (C-level arithmetic); Python datetimes
+    are only built by _dt() for display.
+    """
+    opens: np.ndarray  # float32
+    highs: np.ndarray  # float32
+    lows: np.ndarray  # float32
+    closes: np.ndarray  # float32
+    timestamps: np.ndarray  # datetime64[ns]
     
-    @property
-    def is_bearish(self) -> bool:
-        return self.close < self.open
+    def __len__(self) -> int:
+        return len(self.closes)
+    
+    @classmethod
+    def from_candles(cls, candles: list[Candle]) -> "CandleArray":
+        """Build from a list of Candle objects"""
+        return cls(
+            opens=np.array([c.open for c in candles], dtype=np.float32),
+            highs=np.array([c.high for c in candles], dtype=np.float32),
+            lows=np.array([c.low for c in candles], dtype=np.float32),
+            closes=np.array([c.close for c in candles], dtype=np.float32),
+            timestamps=np.array([c.timestamp for c in candles], dtype="datetime64[ns]")
+        )
+    
+    def _dt(self, i: int) -> datetime:
+        """Timestamp of bar i as a Python datetime, for human output only"""
+        return self.timestamps[i].astype("datetime64[us]").astype(datetime)
+
+
+@njit(cache=True)
+def _scan_30pt_loop(closes, highs, lows, thr):
+    """
+    Single-pass signal scan, compiled by Numba when available.
+    
+    Module level (not a method) so Numba can compile it. Works on
+    float32 or float64 prices (pass thr in the same dtype so the compare
+    isn't widened). Returns (index int64[:], sign int8[:], stop[:]) with
+    stop in the price dtype, trimmed to the number of signals found.
+    """
+    n = closes.shape[0]
+    size = max(n - 1, 0)
+    idx = np.empty(size, np.int64)
+    sign = np.empty(size, np.int8)
+    stop = np.empty_like(closes[:size])
+    
+    count = 0
+    for i in range(1, n):
+        move = closes[i] - closes[i - 1]
+        if move >= thr:
+            idx[count] = i
+            sign[count] = 1
+            stop[count] = lows[i]
+            count += 1
+        elif move <= -thr:
+            idx[count] = i
+            sign[count] = -1
+            stop[count] = highs[i]
+            count += 1
+    
+    return idx[:count], sign[:count], stop[:count]
+
+
+@njit(parallel=True, cache=True)
+def _scan_multi_loop(closes, highs, lows, thr):
+    """
+    Signal scan over many symbols at once, one symbol per thread.
+    
+    Inputs are C-contiguous (n_symbols, n_bars) float64 matrices.
+    Returns (sign int8, stop float64) matrices of the same shape:
+    sign is +1/-1 on breakout bars and 0 elsewhere, stop is NaN where
+    there's no signal. Fixed-size rows, so no shared state between threads.
+    """
+    n_sym, n_bar = closes.shape
+    sign = np.zeros((n_sym, n_bar), np.int8)
+    stop = np.full((n_sym, n_bar), np.nan)
+    
+    for s in prange(n_sym):
+        for i in range(1, n_bar):
+            move = closes[s, i] - closes[s, i - 1]
+            if move >= thr:
+                sign[s, i] = 1
+                stop[s, i] = lows[s, i]
+            elif move <= -thr:
+                sign[s, i] = -1
+                stop[s, i] = highs[s, i]
+    
+    return sign, stop
+
+
+try:
+    # Ahead-of-time build (python -m strategies._compile): no JIT on first call
+    from strategies.momentum_aot import scan_30pt as _scan_30pt, scan_30pt_f4 as _scan_30pt_f4
+    _SCAN_COMPILED = True
+except ImportError:
+    # The JIT dispatcher specializes per dtype itself
+    _scan_30pt = _scan_30pt_f4 = _scan_30pt_loop
+    _SCAN_COMPILED = NUMBA_AVAILABLE
 
 
 class Momentum30pt:
@@ -46,67 +159,173 @@ class Momentum30pt:
     Key: Uses CLOSE price, not wicks.
     """
     
-    def __init__(self):
-        self.candles: list[Candle] = []
+    def __init__(self, history: int = 0):
+        # The rules only need the prior candle, so that's all that's kept
+        self._prev: Optional[Candle] = None
+        # Optional bounded history of closed candles (0 = off)
+        self.history: Optional[deque] = deque(maxlen=history) if history else None
         self.trigger_threshold = 30  # points
         self.current_signal = None
         
-    def on_candle_close(self, candle: Candle) -> Optional[Dict]:
+        # Reused for every signal; values are overwritten in place. Callers get
+        # a read-only view of it (no per-signal allocation)
+        self._signal_buf: Dict = {
+            "direction": "",
+            "sign": 0,
+            "entry_price": 0.0,
+            "stop_price": 0.0,
+            "breakout_candle": None,
+            "prior_candle": None,
+            "move_points": 0.0,
+            "risk_points": 0.0,
+            "target_price": 0.0,
+            "timestamp": None
+        }
+        self._signal_view = MappingProxyType(self._signal_buf)
+        
+    def on_candle_close(self, candle: Candle) -> Optional[Mapping]:
         """
         Process complete 5min candle.
         
-        Returns signal dict if 30pt+ move detected.
+        Returns a read-only signal mapping if 30pt+ move detected. The
+        same mapping is reused for every signal: it is only valid until
+        the next call, so copy it (dict(signal)) to keep it.
         """
-        self.candles.append(candle)
+        prior_candle = self._prev
+        self._prev = candle
+        if self.history is not None:
+            self.history.append(candle)
         
         # Need at least 2 candles
-        if len(self.candles) < 2:
+        if prior_candle is None:
             return None
         
         breakout_candle = candle
-        prior_candle = self.candles[-2]
         
         # Calculate move from prior CLOSE to current CLOSE
         move = breakout_candle.close - prior_candle.close
         
         # Check 30pt threshold
         if abs(move) >= self.trigger_threshold:
-            direction = "Buy" if move > 0 else "Sell"
+            # +1 long / -1 short: machine-readable, "direction" is for humans
+            sign = 1 if move > 0 else -1
+            direction = "Buy" if sign == 1 else "Sell"
+            
+            # Stop at LOW of breakout candle; risk is close-to-low (or high-to-close)
+            if sign == 1:
+                stop = breakout_candle.low
+                risk = breakout_candle.close - stop
+            else:
+                stop = breakout_candle.high
+                risk = stop - breakout_candle.close
+            assert risk >= 0, "candle close outside its high/low"
+            
+            # 1R target, computed once here for printing and order entry
+            target = breakout_candle.close + sign * risk
             
-            # Stop at LOW of breakout candle
-            stop = breakout_candle.low if direction == "Buy" else breakout_candle.high
+            buf = self._signal_buf
+            buf["direction"] = direction
+            buf["sign"] = sign
+            buf["entry_price"] = breakout_candle.close
+            buf["stop_price"] = stop
+            buf["breakout_candle"] = breakout_candle
+            buf["prior_candle"] = prior_candle
+            buf["move_points"] = abs(move)
+            buf["risk_points"] = risk
+            buf["target_price"] = target
+            buf["timestamp"] = breakout_candle.timestamp
             
-            signal = {
-                "direction": direction,
-                "entry_price": breakout_candle.close,
-                "stop_price": stop,
-                "breakout_candle": breakout_candle,
-                "prior_candle": prior_candle,
-                "move_points": abs(move),
-                "risk_points": abs(breakout_candle.close - stop),
-                "timestamp": breakout_candle.timestamp
-            }
+            signal = self._signal_view
             
             self.current_signal = signal
             return signal
         
         return None
     
-    def calculate_target(self, entry: float, stop: float, direction: str) -> float:
+    def scan_batch(self, bars: CandleArray) -> Dict[str, np.ndarray]:
         """
-        Calculate 1R profit target.
+        Find every signal in a candle history in one vectorized pass.
         
-        R = |entry - stop|
-        Target = entry + R (BUY) or entry - R (SELL)
+        Same rules as on_candle_close, for backtests over large
+        histories. Returns signals as arrays (one element per signal):
+        index of the breakout bar, sign (+1 Buy / -1 Sell), entry, stop,
+        move and risk in points, and datetime64 timestamp. Price columns
+        are float64 whatever the storage dtype, like scan_multi.
         """
-        risk = abs(entry - stop)
+        closes = bars.closes
         
-        if direction == "Buy":
-            return entry + risk
+        if _SCAN_COMPILED:
+            # Compiled loop (AOT or JIT): one pass, no temporaries over the full history.
+            # The AOT build only has f4/f8 contiguous signatures, so normalise to
+            # one of them (no copy when the arrays already match)
+            dtype = np.float32 if closes.dtype == np.float32 else np.float64
+            scan = _scan_30pt_f4 if dtype is np.float32 else _scan_30pt
+            closes = np.ascontiguousarray(closes, dtype=dtype)
+            idx, sign, stop = scan(
+                closes,
+                np.ascontiguousarray(bars.highs, dtype=dtype),
+                np.ascontiguousarray(bars.lows, dtype=dtype),
+                dtype(self.trigger_threshold)
+            )
         else:
-            return entry - risk
+            move = closes[1:] - closes[:-1]
+            # move[k] is bar k+1 vs bar k, so the breakout bar is k+1
+            idx = np.flatnonzero(np.abs(move) >= self.trigger_threshold) + 1
+            sign = np.where(move[idx - 1] > 0, 1, -1).astype(np.int8)
+            stop = np.where(sign == 1, bars.lows[idx], bars.highs[idx])
+        
+        # Scan in the storage dtype, widen only the (few) signal rows
+        entry = closes[idx].astype(np.float64)
+        stop = stop.astype(np.float64, copy=False)
+        
+        return {
+            "index": idx,
+            "sign": sign,
+            "entry_price": entry,
+            "stop_price": stop,
+            "move_points": np.abs(entry - closes[idx - 1]),
+            "risk_points": np.where(sign == 1, entry - stop, stop - entry),
+            "timestamp": bars.timestamps[idx]
+        }
+    
+    def scan_multi(self, closes: np.ndarray, highs: np.ndarray, lows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Scan several symbols' histories in parallel (e.g. MNQ, ES, NQ, RTY).
+        
+        Takes (n_symbols, n_bars) price matrices, one row per symbol.
+        Returns (sign, stop) matrices of the same shape: sign is +1/-1 on
+        breakout bars and 0 elsewhere, stop is NaN where there's no signal.
+        """
+        closes = np.ascontiguousarray(closes, dtype=np.float64)
+        highs = np.ascontiguousarray(highs, dtype=np.float64)
+        lows = np.ascontiguousarray(lows, dtype=np.float64)
+        thr = float(self.trigger_threshold)
+        
+        if NUMBA_AVAILABLE:
+            return _scan_multi_loop(closes, highs, lows, thr)
+        
+        sign = np.zeros(closes.shape, dtype=np.int8)
+        move = closes[:, 1:] - closes[:, :-1]
+        sign[:, 1:] = np.where(move >= thr, 1, np.where(move <= -thr, -1, 0))
+        stop = np.where(sign == 1, lows, np.where(sign == -1, highs, np.nan))
+        return sign, stop
+    
+    @staticmethod
+    def calculate_target(entry: float, stop: float, sign: int) -> float:
+        """
+        Calculate 1R profit target.
+        
+        R = |entry - stop|
+        Target = entry + sign * R (sign: +1 BUY, -1 SELL)
+        """
+        return entry + sign * abs(entry - stop)
+    
+    def log_signal(self, signal: Mapping):
+        """Log the signal block at DEBUG; the string is only built if it'll be emitted"""
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s", self.print_signal(signal))
     
-    def print_signal(self, signal: Dict) -> str:
+    def print_signal(self, signal: Mapping) -> str:
         """Pretty print signal details"""
         return f"""
 🎯 30PT MOMENTUM SIGNAL
@@ -114,7 +333,7 @@ class Momentum30pt:
    Entry: {signal['entry_price']:.2f}
    Stop: {signal['stop_price']:.2f} (low of breakout candle)
    Risk: ${signal['risk_points'] * 0.50:.2f} ({signal['risk_points']:.0f} pts)
-   Target: {self.calculate_target(signal['entry_price'], signal['stop_price'], signal['direction']):.2f} (1R)
+   Target: {signal['target_price']:.2f} (1R)
    Move: {signal['move_points']:.0f} pts
    Type: Set and forget, TP at 1R
         """
@@ -122,6 +341,8 @@ class Momentum30pt:
 
 # Test
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    log.setLevel(logging.DEBUG)  # signal blocks only; keeps numba's own debug logs quiet
     strategy = Momentum30pt()
     
     # Simulate candles
@@ -140,4 +361,8 @@ if __name__ == "__main__":
     for c in candles:
         signal = strategy.on_candle_close(c)
         if signal:
-            print(strategy.print_signal(signal))
+            strategy.log_signal(signal)
+    
+    # Same history, vectorized
+    signals = Momentum30pt().scan_batch(CandleArray.from_candles(candles))
+    log.info("scan_batch: %s signal(s) at bars %s", len(signals["index"]), signals["index"].tolist())
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+JSON codec shim
+Uses orjson (C parser, accepts bytes) when installed, stdlib json otherwise.
+
+loads(str | bytes) -> object
+dumps(object) -> bytes
+"""
+
+try:
+    import orjson
+
+    loads = orjson.loads
+    dumps = orjson.dumps
+
+except ImportError:
+    import json
+
+    loads = json.loads
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Numba shim
+Uses numba.njit when installed; otherwise njit is a no-op decorator and
+prange is range, so decorated functions still run as plain Python.
+"""
+
+try:
+    from numba import njit, prange
+
+    NUMBA_AVAILABLE = True
+
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        # Bare @njit
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        # @njit(...) with options
+        return lambda func: func
@@ -6,10 +6,22 @@ Handles: token acquisition, renewal, session management
 
 import os
 import time
+import random
 import asyncio
-import aiohttp
+import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any, Awaitable, Callable, Tuple
+
+from utils._json import loads, dumps
+
+if TYPE_CHECKING:
+    import aiohttp  # annotations only; imported lazily in start()
+
+log = logging.getLogger(__name__)
+
+
+class AuthFatalError(RuntimeError):
+    """Auth request rejected in a way retrying won't fix (4xx other than 401/429)"""
 
 
 class TradovateAuth:
@@ -21,6 +33,10 @@ class TradovateAuth:
     - Max 2 concurrent sessions
     - Use Bearer token for all requests
     - Separate mdAccessToken for WebSocket
+    
+    Failed requests are retried with capped exponential backoff plus
+    jitter (429 honors Retry-After), never in a tight loop: a retry
+    storm risks rate limits and the 2-session cap.
     """
     
     def __init__(self):
@@ -29,17 +45,61 @@ class TradovateAuth:
         self.md_access_token: Optional[str] = None
         self.user_id: Optional[int] = None
         self.account_id: Optional[int] = None
-        self.token_created: Optional[datetime] = None
+        self.token_created: Optional[datetime] = None  # wall clock, for logging
+        self._token_created_mono: Optional[float] = None  # time.monotonic(), for renewal
+        self._token_ready = asyncio.Event()  # set once a token is held
         self.renew_threshold = timedelta(minutes=75)
+        self.max_backoff = 60.0  # seconds, cap for one retry delay
         self.base_url = self._get_base_url()
         
+        # One keep-alive session for auth + renewals; headers built once
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._json_headers = {"Content-Type": "application/json"}
+        self._auth_headers = {"Authorization": "", "Content-Type": "application/json"}
+    
+    async def start(self):
+        """Open the shared HTTP session (idempotent)"""
+        # Imported here so constructing/importing TradovateAuth stays cheap
+        import aiohttp
+        
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=4,
+                    keepalive_timeout=300,
+                    ttl_dns_cache=300
+                )
+            )
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def _set_token(self, token: Optional[str]):
+        """Store access token, stamp its age, update the cached auth headers in place"""
+        self.access_token = token
+        self._auth_headers["Authorization"] = f"Bearer {token}"
+        self.token_created = datetime.now()
+        self._token_created_mono = time.monotonic()
+        self._token_ready.set()
+        
+    def _clear_token(self):
+        """Forget a token the server has rejected"""
+        # _token_ready stays set: auto_renew keeps retrying authenticate
+        self.access_token = None
+        self._auth_headers["Authorization"] = ""
+        
     def _load_credentials(self):
-        """Load from environment"""
+        """Load from environment (validated on first authenticate)"""
         self.username = os.getenv("TRADOVATE_USERNAME")
         self.password = os.getenv("TRADOVATE_PASSWORD")
         self.api_secret = os.getenv("TRADOVATE_API_SECRET")
         self.account_id_from_env = os.getenv("TRADOVATE_ACCOUNT_ID")
-        
+    
+    def _require_credentials(self):
+        """Raise if credentials are missing"""
         if not all([self.username, self.password, self.api_secret]):
             raise ValueError("Set TRADOVATE_USERNAME, PASSWORD, and API_SECRET")
     
@@ -59,12 +119,54 @@ class TradovateAuth:
         """
         return "wss://md.tradovateapi.com/v1/websocket"
     
-    async def authenticate(self) -> bool:
+    async def _with_backoff(
+        self,
+        coro_factory: Callable[[], Awaitable[Tuple[int, Optional[str]]]],
+        max_attempts: Optional[int] = 5
+    ) -> Optional[int]:
         """
-        Get access token from Tradovate.
+        Run a request, retrying transient failures with backoff + jitter.
         
-        POST /auth/accessTokenRequest
+        coro_factory() makes a fresh request coroutine returning
+        (HTTP status, Retry-After header). 429, 5xx and network errors are
+        retried after min(max_backoff, 2**attempt) + U(0, 1)s, or Retry-After
+        (capped at max_backoff) for a 429. max_attempts=None retries until
+        the request succeeds or is rejected. Returns the final status: 200,
+        401 (caller decides), or the last failure (None for a network
+        error) once attempts run out. Raises AuthFatalError for any other 4xx.
         """
+        import aiohttp
+        
+        status = None
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                status, retry_after = await coro_factory()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                log.warning("Auth request error: %r", e)
+                status = None
+            
+            if status == 200 or status == 401:
+                return status
+            if status is not None and 400 <= status < 500 and status != 429:
+                raise AuthFatalError(f"HTTP {status}")
+            
+            attempt += 1
+            if max_attempts is not None and attempt >= max_attempts:
+                return status
+            
+            delay = min(self.max_backoff, 2 ** min(attempt - 1, 16)) + random.random()
+            if status == 429 and retry_after:
+                try:
+                    delay = min(self.max_backoff, float(retry_after))
+                except ValueError:
+                    pass  # HTTP-date form: keep the backoff delay
+            log.warning("Auth request failed (%s), retry %s in %.1fs", status, attempt, delay)
+            await asyncio.sleep(delay)
+    
+    async def _request_token(self) -> Tuple[int, Optional[str]]:
+        """POST /auth/accessTokenRequest, storing the tokens on success"""
         url = f"{self.base_url}/auth/accessTokenRequest"
         
         payload = {
@@ -76,78 +178,120 @@ class TradovateAuth:
             "sec": self.api_secret
         }
         
+        await self.start()
+        async with self._session.post(url, data=dumps(payload), headers=self._json_headers) as resp:
+            if resp.status == 200:
+                data = loads(await resp.read())
+                
+                self._set_token(data.get("accessToken"))
+                self.md_access_token = data.get("mdAccessToken")
+                self.user_id = data.get("userId")
+                self.account_id = data.get("accountId") or self.account_id_from_env
+            
+            return resp.status, resp.headers.get("Retry-After")
+    
+    async def _request_renewal(self) -> Tuple[int, Optional[str]]:
+        """POST /auth/renewAccessToken, storing the new token on success"""
+        url = f"{self.base_url}/auth/renewAccessToken"
+        
+        await self.start()
+        async with self._session.post(url, headers=self._auth_headers) as resp:
+            if resp.status == 200:
+                data = loads(await resp.read())
+                self._set_token(data.get("accessToken"))
+            
+            return resp.status, resp.headers.get("Retry-After")
+    
+    async def _authenticate(self, max_attempts: Optional[int] = 5) -> bool:
+        """Authenticate with backoff; raises AuthFatalError if rejected"""
+        self._require_credentials()
+        
+        status = await self._with_backoff(self._request_token, max_attempts)
+        if status == 401:
+            raise AuthFatalError("credentials rejected (HTTP 401)")
+        if status != 200:
+            log.error("Auth failed: %s", status)
+            return False
+        
+        log.info("✅ Authenticated. User: %s, Account: %s", self.user_id, self.account_id)
+        return True
+    
+    async def authenticate(self) -> bool:
+        """
+        Get access token from Tradovate.
+        
+        POST /auth/accessTokenRequest
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as resp:
-                    if resp.status != 200:
-                        print(f"Auth failed: {resp.status}")
-                        return False
-                    
-                    data = await resp.json()
-                    
-                    self.access_token = data.get("accessToken")
-                    self.md_access_token = data.get("mdAccessToken")
-                    self.user_id = data.get("userId")
-                    self.account_id = data.get("accountId") or self.account_id_from_env
-                    self.token_created = datetime.now()
-                    
-                    print(f"✅ Authenticated. User: {self.user_id}, Account: {self.account_id}")
-                    return True
-                    
-        except Exception as e:
-            print(f"Authentication error: {e}")
+            return await self._authenticate()
+        except AuthFatalError as e:
+            log.error("Authentication error: %s", e)
             return False
     
-    async def renew_token(self) -> bool:
+    async def renew_token(self, max_attempts: Optional[int] = 5) -> bool:
         """
         Renew access token before expiry.
         
         Call at 75 minutes, token expires at 90.
         POST /auth/renewAccessToken
+        
+        A 401 means the token is already dead: it is dropped and a fresh
+        one requested. Raises AuthFatalError for non-retryable rejections.
+        max_attempts is passed to _with_backoff (None = until done).
         """
         if not self.access_token:
-            return await self.authenticate()
+            return await self._authenticate(max_attempts)
         
-        url = f"{self.base_url}/auth/renewAccessToken"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
+        status = await self._with_backoff(self._request_renewal, max_attempts)
+        if status == 200:
+            log.info("✅ Token renewed")
+            return True
+        if status == 401:
+            log.warning("Token rejected, re-authenticating")
+            self._clear_token()
+            return await self._authenticate(max_attempts)
         
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        self.access_token = data.get("accessToken")
-                        self.token_created = datetime.now()
-                        print("✅ Token renewed")
-                        return True
-                    else:
-                        print(f"Renewal failed: {resp.status}")
-                        return await self.authenticate()
-        except Exception as e:
-            print(f"Renewal error: {e}")
-            return await self.authenticate()
+        log.warning("Renewal failed: %s", status)
+        return False
     
     async def auto_renew(self):
-        """Background task: auto-renew token before expiry"""
+        """
+        Background task: auto-renew token before expiry.
+        
+        Sleeps until the renewal deadline instead of polling. Token age is
+        measured on the monotonic clock, so wall-clock jumps don't matter.
+        Failed renewals are retried by _with_backoff alone (no attempt
+        limit, delays capped at max_backoff) until they succeed. Returns on
+        AuthFatalError: the token can't be renewed any more.
+        """
+        renew_after = self.renew_threshold.total_seconds()
+        
         while True:
-            await asyncio.sleep(60)  # Check every minute
+            # Not authenticated yet: wait for the first token, no polling
+            await self._token_ready.wait()
             
-            if not self.token_created:
+            remaining = renew_after - (time.monotonic() - self._token_created_mono)
+            if remaining > 0:
+                # Re-check after waking: the token may have been replaced meanwhile
+                await asyncio.sleep(max(1.0, remaining))
                 continue
             
-            elapsed = datetime.now() - self.token_created
-            if elapsed >= self.renew_threshold:
-                print("Renewing token (75min reached)...")
-                await self.renew_token()
+            log.info("Renewing token (75min reached)...")
+            try:
+                await self.renew_token(max_attempts=None)
+            except AuthFatalError as e:
+                log.error("❌ Token renewal stopped: %s", e)
+                return
     
     def get_auth_headers(self) -> Dict[str, str]:
-        """Get headers for authenticated requests"""
+        """
+        Get headers for authenticated requests.
+        
+        Returns a shared dict kept current on renewal; don't mutate it.
+        """
         if not self.access_token:
             raise RuntimeError("Not authenticated")
-        return {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
+        return self._auth_headers
     
     def is_authenticated(self) -> bool:
         """Check if we have active token"""
@@ -163,9 +307,11 @@ def test_auth():
         success = await auth.authenticate()
         print(f"Auth success: {success}")
         print(f"Token: {auth.access_token[:20]}...")
+        await auth.close()
     
     asyncio.run(run())
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     test_auth()